@@ -6,6 +6,22 @@ class Config:
         self.TEXT_MODEL = "llama-3.1-70b-versatile"
         self.VISION_MODEL = "llava-v1.5-7b-4096-preview"
         self.ROOT_PATH = ""  # Set this when initializing the FileOrganizer
+        # How extra copies of identical files are handled: "replicate" applies the
+        # primary copy's suggestions, "hardlink" links them to the primary copy and
+        # "delete" moves them to the delete_these folder. A hardlinked copy gets its
+        # own data back before a note is appended to it, so notes never spread.
+        self.DEDUP_POLICY = "replicate"
+        # Progress is saved here (inside the organized folder) so a stopped run can resume
+        self.CHECKPOINT_FILE = ".file_organizer_checkpoint.json"
+        self.CHECKPOINT_INTERVAL = 30  # Seconds between checkpoint saves
+        # Files are organized highest score first. SCORE_FUNCTION may be set to a
+        # callable(file_path, features) -> float to replace the weighted default.
+        self.SCHEDULE_WEIGHTS = {"recency": 1.0, "size": 1.0, "depth": 0.5, "rule_miss": 1.0}
+        self.SCORE_FUNCTION = None
+        # Per-run budgets; None means unlimited. Unfinished work is deferred to the next run.
+        self.TIME_BUDGET = None  # Seconds
+        self.API_CALL_BUDGET = None
+        self.TOKEN_BUDGET = None
         self.TOOLS = [
             {
                 "type": "function",
@@ -1,4 +1,3 @@
-import os
 from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QPushButton, QFileDialog, QTextEdit, QWidget, QProgressBar, QLabel
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
@@ -12,13 +11,13 @@ class OrganizerThread(QThread):
         self.folder_path = folder_path
 
     def run(self):
-        total_files = sum([len(files) for r, d, files in os.walk(self.folder_path)])
+        total_files = max(self.file_organizer.count_remaining_files(self.folder_path), 1)
         processed_files = 0
 
         def process_callback(message):
             nonlocal processed_files
             processed_files += 1
-            progress = int((processed_files / total_files) * 100)
+            progress = min(int((processed_files / total_files) * 100), 100)
             self.update_progress.emit(progress)
             self.update_log.emit(message)
 
@@ -44,6 +43,16 @@ class MainWindow(QMainWindow):
         self.organize_button.clicked.connect(self.organize_files)
         layout.addWidget(self.organize_button)
 
+        self.pause_button = QPushButton('Pause')
+        self.pause_button.setEnabled(False)
+        self.pause_button.clicked.connect(self.toggle_pause)
+        layout.addWidget(self.pause_button)
+
+        self.cancel_button = QPushButton('Cancel')
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_organizing)
+        layout.addWidget(self.cancel_button)
+
         self.undo_button = QPushButton('Undo Changes')
         self.undo_button.clicked.connect(self.undo_changes)
         layout.addWidget(self.undo_button)
@@ -73,11 +82,15 @@ class MainWindow(QMainWindow):
             self.log_text.append("Organizing files...")
             self.progress_bar.setValue(0)
             self.status_label.setText('Organizing...')
+            self.file_organizer.reset()
             self.organizer_thread = OrganizerThread(self.file_organizer, self.selected_folder)
             self.organizer_thread.update_progress.connect(self.update_progress)
             self.organizer_thread.update_log.connect(self.update_log)
             self.organizer_thread.finished.connect(self.organization_complete)
             self.organizer_thread.start()
+            self.organize_button.setEnabled(False)
+            self.pause_button.setEnabled(True)
+            self.cancel_button.setEnabled(True)
         else:
             self.log_text.append("Please select a folder first.")
 
@@ -87,9 +100,41 @@ class MainWindow(QMainWindow):
     def update_log(self, message):
         self.log_text.append(message)
 
+    def toggle_pause(self):
+        if self.file_organizer.resume_event.is_set():
+            self.file_organizer.pause()
+            self.pause_button.setText('Resume')
+            self.status_label.setText('Paused')
+            self.log_text.append("Pausing after the current step...")
+        else:
+            self.file_organizer.resume()
+            self.pause_button.setText('Pause')
+            self.status_label.setText('Organizing...')
+            self.log_text.append("Resuming...")
+
+    def cancel_organizing(self):
+        self.log_text.append("Stopping after the current step...")
+        self.status_label.setText('Stopping...')
+        self.file_organizer.cancel()
+
     def organization_complete(self):
-        self.log_text.append("Organization complete!")
+        if self.file_organizer.cancel_event.is_set():
+            self.log_text.append("Organization stopped. Progress saved; run again to resume.")
+        elif self.file_organizer.deferred:
+            self.log_text.append(f"Budget reached. {len(self.file_organizer.deferred)} files deferred; run again to continue.")
+        else:
+            self.log_text.append("Organization complete!")
         self.status_label.setText('Ready')
+        self.organize_button.setEnabled(True)
+        self.pause_button.setEnabled(False)
+        self.pause_button.setText('Pause')
+        self.cancel_button.setEnabled(False)
+
+    def closeEvent(self, event):
+        if hasattr(self, 'organizer_thread') and self.organizer_thread.isRunning():
+            self.file_organizer.cancel()
+            self.organizer_thread.wait()
+        event.accept()
 
     def undo_changes(self):
         self.log_text.append("Undoing changes...")
@@ -2,6 +2,7 @@ import os
 import shutil
 from groq import Groq
 from tools.file_tools import move_file, create_folder, add_note, rename_file, delete_file, add_tag
+from organizer.scheduler import WorkScheduler, RunBudget
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
@@ -14,6 +15,8 @@ from tenacity import retry, stop_after_attempt, wait_exponential
 import hashlib
 import datetime
 import zipfile
+import threading
+from collections import deque
 
 class FileOrganizer:
     def __init__(self, config):
@@ -28,6 +31,38 @@ class FileOrganizer:
         mimetypes.init()
         self.file_tags = {}
         self.file_descriptions = {}
+        self.duplicate_of = {}
+        self.completed = set()
+        self.in_flight = {}
+        self.cancel_event = threading.Event()
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        self.scheduler = WorkScheduler(config, self._categorize_file)
+        self.api_calls = 0
+        self.tokens_used = 0
+        self.deferred = []
+
+    def pause(self):
+        self.resume_event.clear()
+
+    def resume(self):
+        self.resume_event.set()
+
+    def cancel(self):
+        self.cancel_event.set()
+        self.resume_event.set()
+
+    def reset(self):
+        # Called when a run is started; organize_folder keeps any pause or cancel requested after this
+        self.cancel_event.clear()
+        self.resume_event.set()
+
+    def _should_stop(self):
+        # Blocks while paused; returns True once cancellation has been requested
+        while not self.resume_event.wait(0.2):
+            if self.cancel_event.is_set():
+                break
+        return self.cancel_event.is_set()
 
     def _is_processable_file(self, file_path):
         _, ext = os.path.splitext(file_path)
@@ -59,31 +94,49 @@ class FileOrganizer:
             return None
 
     def _process_file(self, original_path, callback=None):
+        # Returns without marking the file completed if the run is cancelled
         current_path = self.file_locations.get(original_path)
         if not current_path or not os.path.exists(current_path):
             print(f"File no longer exists or has been moved: {current_path}")
+            self.completed.add(original_path)
             return
         
         if not self._is_processable_file(current_path):
             print(f"Skipping non-processable file: {current_path}")
+            self.completed.add(original_path)
             if callback:
                 callback(f"Skipped: {current_path}")
             return
 
-        file_content = self._read_file(current_path)
-        if file_content is not None:
-            category = self._categorize_file(current_path)
+        if original_path in self.in_flight:
+            # The suggestion was received before the previous run stopped
+            response = self.in_flight[original_path]
+        else:
+            file_content = self._read_file(current_path)
+            if file_content is None:
+                print(f"Empty or unreadable file: {current_path}")
+                self.completed.add(original_path)
+                if callback:
+                    callback(f"Skipped: {current_path}")
+                return
+            if self._should_stop():
+                return
             response = self._get_ai_suggestion(current_path, file_content)
             if response:
-                self._execute_suggestion(response, original_path)
-            else:
-                print(f"No valid suggestions for {current_path}")
-            if callback:
-                callback(f"Processed: {current_path}")
+                # Failed calls are left out so a resumed run retries them
+                self.in_flight[original_path] = response
+
+        if self._should_stop():
+            return
+        if response:
+            self._execute_suggestion(response, original_path)
         else:
-            print(f"Empty or unreadable file: {current_path}")
-            if callback:
-                callback(f"Skipped: {current_path}")
+            print(f"No valid suggestions for {current_path}")
+        self.in_flight.pop(original_path, None)
+        self.completed.add(original_path)
+        if callback:
+            callback(f"Processed: {current_path}")
+        return response
 
     def _categorize_file(self, file_path):
         _, ext = os.path.splitext(file_path)
@@ -104,21 +157,63 @@ class FileOrganizer:
     def _get_file_hash(self, file_path):
         hasher = hashlib.md5()
         with open(file_path, 'rb') as f:
-            buf = f.read()
-            hasher.update(buf)
+            for chunk in iter(lambda: f.read(65536), b''):
+                hasher.update(chunk)
         return hasher.hexdigest()
 
+    def _group_by_content(self, file_paths):
+        # Only files whose size matches another candidate are hashed. Empty files,
+        # non-processable files and Python files that import other modules are
+        # never grouped, since their location matters more than their content.
+        by_size = {}
+        for file_path in file_paths:
+            if self._should_stop():
+                return []
+            if not self._is_processable_file(file_path) or self.dependencies.get(file_path):
+                continue
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                continue
+            if size > 0:
+                by_size.setdefault(size, []).append(file_path)
+
+        keys = {}
+        for size, paths in by_size.items():
+            if len(paths) < 2:
+                continue
+            for file_path in paths:
+                if self._should_stop():
+                    return []
+                try:
+                    keys[file_path] = ("content", size, self._get_file_hash(file_path))
+                except Exception as e:
+                    print(f"Error hashing file {file_path}: {str(e)}")
+
+        groups = {}
+        for file_path in file_paths:
+            groups.setdefault(keys.get(file_path, ("path", file_path)), []).append(file_path)
+        return list(groups.values())
+
     def _find_duplicates(self):
-        hashes = {}
         duplicates = []
-        for file_path in self.file_locations.values():
-            file_hash = self._get_file_hash(file_path)
-            if file_hash in hashes:
-                duplicates.append((file_path, hashes[file_hash]))
-            else:
-                hashes[file_hash] = file_path
+        for group in self._group_by_content(list(self.file_locations.values())):
+            duplicates.extend((file_path, group[0]) for file_path in group[1:])
         return duplicates
 
+    def _is_same_path(self, path, other_path):
+        # Compares locations, not inodes: a hardlinked copy is still a different file
+        return os.path.normcase(os.path.abspath(path)) == os.path.normcase(os.path.abspath(other_path))
+
+    def _unique_path(self, path):
+        if not os.path.exists(path):
+            return path
+        base, ext = os.path.splitext(path)
+        counter = 1
+        while os.path.exists(f"{base}_{counter}{ext}"):
+            counter += 1
+        return f"{base}_{counter}{ext}"
+
     def _analyze_file_content(self, file_path):
         with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
             content = f.read()
@@ -192,12 +287,16 @@ Provide your suggestions using the available tools. You can use multiple tools i
 Explain your reasoning for each suggestion."""
 
         try:
+            self.api_calls += 1
             response = self.client.chat.completions.create(
                 model=self.config.TEXT_MODEL,
                 messages=[{"role": "user", "content": prompt}],
                 tools=self.config.TOOLS,
                 max_tokens=1000
             )
+            usage = getattr(response, 'usage', None)
+            if usage and usage.total_tokens:
+                self.tokens_used += usage.total_tokens
             return self._process_ai_response(response, file_path)
         except Exception as e:
             print(f"Error getting AI suggestion for {file_path}: {str(e)}")
@@ -256,6 +355,12 @@ Explain your reasoning for each suggestion."""
 
             if tool_name == "move_file":
                 destination = os.path.join(self.config.ROOT_PATH, args.get('destination'))
+                if os.path.isdir(destination):
+                    destination = os.path.join(destination, os.path.basename(current_path))
+                if self._is_same_path(current_path, destination):
+                    print(f"File is already in place: {current_path}")
+                    continue
+                destination = self._unique_path(destination)
                 if self._is_safe_to_move(current_path, destination):
                     if not os.path.isdir(current_path):
                         backup_path = self._create_backup(current_path)
@@ -272,12 +377,19 @@ Explain your reasoning for each suggestion."""
                 folder_path = os.path.join(self.config.ROOT_PATH, args.get('path'))
                 create_folder(folder_path)
             elif tool_name == "add_note":
+                # Notes are appended in place, so hardlinked copies must not share the edit
+                if os.path.isfile(current_path) and os.stat(current_path).st_nlink > 1:
+                    self._break_hardlink(current_path)
                 success = add_note(current_path, args.get('note'))
                 if not success:
                     print(f"Failed to add note to {current_path}")
             elif tool_name == "rename_file":
                 new_name = args.get('new_name')
-                if new_name:
+                new_path = os.path.join(os.path.dirname(current_path), new_name) if new_name else None
+                if new_path and self._is_same_path(current_path, new_path):
+                    print(f"File already has this name: {current_path}")
+                elif new_name:
+                    new_name = os.path.basename(self._unique_path(new_path))
                     if not os.path.isdir(current_path):
                         backup_path = self._create_backup(current_path)
                         if backup_path:
@@ -290,7 +402,7 @@ Explain your reasoning for each suggestion."""
             elif tool_name == "delete_file":
                 delete_these_folder = os.path.join(self.config.ROOT_PATH, "delete_these")
                 create_folder(delete_these_folder)
-                delete_destination = os.path.join(delete_these_folder, os.path.basename(current_path))
+                delete_destination = self._unique_path(os.path.join(delete_these_folder, os.path.basename(current_path)))
                 if not os.path.isdir(current_path):
                     backup_path = self._create_backup(current_path)
                     if backup_path:
@@ -311,6 +423,85 @@ Explain your reasoning for each suggestion."""
                     else:
                         print(f"Failed to add tag '{tag}' to {current_path}")
 
+    def _process_duplicates(self, primary_path, duplicates, suggestions, callback=None):
+        policy = self.config.DEDUP_POLICY
+        primary_current = self.file_locations.get(primary_path)
+        primary_exists = bool(primary_current) and os.path.exists(primary_current)
+        primary_hash = None
+        shared_backup = None
+
+        for duplicate_path in duplicates:
+            current_path = self.file_locations.get(duplicate_path)
+            if not current_path or not os.path.exists(current_path):
+                print(f"File no longer exists or has been moved: {current_path}")
+                continue
+            self.duplicate_of[duplicate_path] = primary_path
+
+            if policy == "delete" and primary_exists:
+                # Every copy has the same content, so a single backup covers the group.
+                # Moving or renaming the primary copy has already created one.
+                if shared_backup is None and primary_current == primary_path:
+                    shared_backup = self._create_backup(current_path)
+                    if shared_backup:
+                        print(f"Created backup: {shared_backup}")
+                self._move_duplicate_to_delete(duplicate_path)
+            elif policy == "hardlink" and primary_exists:
+                if primary_hash is None:
+                    primary_hash = self._get_file_hash(primary_current)
+                if not self._hardlink_duplicate(duplicate_path, primary_current, primary_hash):
+                    self._execute_suggestion(self._replicate_suggestions(suggestions), duplicate_path)
+            else:
+                self._execute_suggestion(self._replicate_suggestions(suggestions), duplicate_path)
+
+            if callback:
+                callback(f"Deduplicated: {current_path} (copy of {primary_path})")
+
+    def _replicate_suggestions(self, suggestions):
+        replicated = []
+        for suggestion in suggestions or []:
+            tool_name = suggestion["tool"]
+            args = dict(suggestion["args"])
+            if tool_name == "create_folder":
+                # Already created while handling the primary copy
+                continue
+            # Name collisions with the primary copy are resolved by _execute_suggestion
+            replicated.append({"tool": tool_name, "args": args})
+        return replicated
+
+    def _move_duplicate_to_delete(self, duplicate_path):
+        current_path = self.file_locations[duplicate_path]
+        delete_these_folder = os.path.join(self.config.ROOT_PATH, "delete_these")
+        create_folder(delete_these_folder)
+        delete_destination = self._unique_path(os.path.join(delete_these_folder, os.path.basename(current_path)))
+        new_path = move_file(current_path, delete_destination)
+        if new_path:
+            self.changes.append(("move_to_delete", current_path, new_path))
+            self.file_locations[duplicate_path] = new_path
+            print(f"Moved duplicate to delete_these folder: {current_path} -> {new_path}")
+
+    def _hardlink_duplicate(self, duplicate_path, target_path, target_hash):
+        current_path = self.file_locations[duplicate_path]
+        try:
+            # The primary copy may have been edited (e.g. by add_note) since grouping
+            if self._get_file_hash(current_path) != target_hash:
+                print(f"Content changed, not hardlinking: {current_path}")
+                return False
+            temp_path = current_path + ".dedup_tmp"
+            os.link(target_path, temp_path)
+            os.replace(temp_path, current_path)
+            self.changes.append(("hardlink", current_path, target_path))
+            print(f"Hardlinked duplicate: {current_path} -> {target_path}")
+            return True
+        except Exception as e:
+            print(f"Error hardlinking {current_path} to {target_path}: {str(e)}")
+            return False
+
+    def _break_hardlink(self, file_path):
+        # Gives the file its own copy of the data
+        temp_path = file_path + ".dedup_tmp"
+        shutil.copy2(file_path, temp_path)
+        os.replace(temp_path, file_path)
+
     def _is_safe_to_move(self, source, destination):
         source_dir = os.path.dirname(source)
         dest_dir = os.path.dirname(destination)
@@ -341,12 +532,27 @@ Explain your reasoning for each suggestion."""
                         print(f"Error undoing {action} {destination} -> {source}: {str(e)}")
                 else:
                     print(f"Cannot undo {action}: {destination} -> {source}")
+            elif action == "hardlink":
+                if os.path.exists(source):
+                    try:
+                        self._break_hardlink(source)
+                        print(f"Undid {action}: {source}")
+                    except Exception as e:
+                        print(f"Error undoing {action} {source}: {str(e)}")
+                else:
+                    print(f"Cannot undo {action}: {source}")
         self.changes.clear()
+        # A saved checkpoint still describes the undone run, so the next run starts over
+        if self.config.ROOT_PATH:
+            self._remove_checkpoint()
+        self.completed = set()
+        self.in_flight = {}
 
     def _generate_report(self):
         report = {
             "total_files_processed": len(self.file_locations),
             "changes_made": len(self.changes),
+            "deferred_files": len(self.deferred),
             "file_categories": {},
             "actions_taken": {
                 "move": 0,
@@ -359,7 +565,7 @@ Explain your reasoning for each suggestion."""
 
         for change in self.changes:
             action = change[0]
-            report["actions_taken"][action] += 1
+            report["actions_taken"][action] = report["actions_taken"].get(action, 0) + 1
 
         for file_path in self.file_locations.values():
             category = self._categorize_file(file_path)
@@ -379,23 +585,159 @@ Explain your reasoning for each suggestion."""
                     index_file.write(f"Description: {self.file_descriptions[file_path]}\n")
                 if file_path in self.file_tags:
                     index_file.write(f"Tags: {', '.join(self.file_tags[file_path])}\n")
+                if file_path in self.duplicate_of:
+                    primary_path = self.file_locations.get(self.duplicate_of[file_path], self.duplicate_of[file_path])
+                    index_file.write(f"Duplicate of: {os.path.relpath(primary_path, self.config.ROOT_PATH)}\n")
                 index_file.write("\n")
         print(f"Created index file at {index_path}")
 
     def organize_folder(self, folder_path, callback=None):
         self.config.ROOT_PATH = folder_path
+        self.api_calls = 0
+        self.tokens_used = 0
+        self.deferred = []
+        budget = RunBudget(self.config.TIME_BUDGET, self.config.API_CALL_BUDGET, self.config.TOKEN_BUDGET)
         self._analyze_dependencies(folder_path)
         self._build_project_structure(folder_path)
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                original_path = os.path.join(root, file)
-                self.file_locations[original_path] = original_path
-                self._process_file(original_path, callback)
+        if self.cancel_event.is_set():
+            print("Run cancelled before any file was processed")
+            return
+
+        checkpoint = self._load_checkpoint(folder_path)
+        if checkpoint is not None:
+            pending = deque(checkpoint)
+            print(f"Resuming from checkpoint: {len(self.completed)} files done, {len(pending)} groups pending")
+        else:
+            self.completed = set()
+            self.in_flight = {}
+            file_paths = []
+            for root, dirs, files in os.walk(folder_path):
+                for file in files:
+                    if self._should_stop():
+                        print("Run cancelled before any file was processed")
+                        return
+                    if file == self.config.CHECKPOINT_FILE:
+                        continue
+                    original_path = os.path.join(root, file)
+                    self.file_locations[original_path] = original_path
+                    file_paths.append(original_path)
+            groups = self._group_by_content(file_paths)
+            if self.cancel_event.is_set():
+                print("Run cancelled before any file was processed")
+                return
+            pending = deque(self.scheduler.order(groups, self.project_structure))
+
+        last_checkpoint = time.time()
+        exhausted = None
+        while pending and not self._should_stop():
+            exhausted = budget.exhausted(self.api_calls, self.tokens_used)
+            if exhausted:
+                break
+            group = pending[0]
+            suggestions = self._process_file(group[0], callback)
+            if group[0] not in self.completed:
+                break
+            primary_current = self.file_locations.get(group[0])
+            if len(group) > 1 and not (primary_current and os.path.exists(primary_current)):
+                # The primary copy vanished before it was handled, so the next copy takes its place
+                pending[0] = group[1:]
+                continue
+            if len(group) > 1:
+                self._process_duplicates(group[0], group[1:], suggestions, callback)
+            self.completed.update(group)
+            pending.popleft()
+            if time.time() - last_checkpoint >= self.config.CHECKPOINT_INTERVAL:
+                self._save_checkpoint(pending)
+                last_checkpoint = time.time()
+
+        if pending:
+            self._save_checkpoint(pending)
+            self.deferred = [file_path for group in pending for file_path in group]
+            if exhausted:
+                print(f"{exhausted} budget exhausted; deferred {len(self.deferred)} files to the next run:")
+                for file_path in self.deferred:
+                    print(f"  {file_path}")
+                if callback:
+                    callback(f"Budget reached ({exhausted}): {len(self.deferred)} files deferred to the next run")
+            else:
+                print(f"Run stopped with {len(pending)} groups pending; progress saved")
+                if callback:
+                    callback(f"Stopped: {len(self.deferred)} files left for the next run")
+            return
+        self._remove_checkpoint()
         self._create_index_file()
 
+    def _checkpoint_path(self, folder_path):
+        return os.path.join(folder_path, self.config.CHECKPOINT_FILE)
+
+    def _save_checkpoint(self, pending):
+        checkpoint = {
+            "root_path": self.config.ROOT_PATH,
+            "completed": list(self.completed),
+            "pending": list(pending),
+            "in_flight": self.in_flight,
+            "file_locations": self.file_locations,
+            "changes": self.changes,
+            "file_tags": {path: list(tags) for path, tags in self.file_tags.items()},
+            "file_descriptions": self.file_descriptions,
+            "duplicate_of": self.duplicate_of
+        }
+        checkpoint_path = self._checkpoint_path(self.config.ROOT_PATH)
+        temp_path = checkpoint_path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f)
+            os.replace(temp_path, checkpoint_path)
+        except Exception as e:
+            print(f"Error saving checkpoint {checkpoint_path}: {str(e)}")
+
+    def _read_checkpoint(self, folder_path):
+        checkpoint_path = self._checkpoint_path(folder_path)
+        if not os.path.exists(checkpoint_path):
+            return None
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except Exception as e:
+            print(f"Error reading checkpoint {checkpoint_path}: {str(e)}")
+            return None
+        if checkpoint.get("root_path") != folder_path:
+            print(f"Ignoring checkpoint for a different folder: {checkpoint_path}")
+            return None
+        return checkpoint
+
+    def _load_checkpoint(self, folder_path):
+        checkpoint = self._read_checkpoint(folder_path)
+        if checkpoint is None:
+            return None
+        self.completed = set(checkpoint["completed"])
+        self.in_flight = checkpoint["in_flight"]
+        self.file_locations.update(checkpoint["file_locations"])
+        self.changes = [tuple(change) for change in checkpoint["changes"]]
+        self.file_tags = {path: set(tags) for path, tags in checkpoint["file_tags"].items()}
+        self.file_descriptions.update(checkpoint["file_descriptions"])
+        self.duplicate_of.update(checkpoint["duplicate_of"])
+        return checkpoint["pending"]
+
+    def _remove_checkpoint(self):
+        checkpoint_path = self._checkpoint_path(self.config.ROOT_PATH)
+        if os.path.exists(checkpoint_path):
+            try:
+                os.remove(checkpoint_path)
+            except Exception as e:
+                print(f"Error removing checkpoint {checkpoint_path}: {str(e)}")
+
+    def count_remaining_files(self, folder_path):
+        checkpoint = self._read_checkpoint(folder_path)
+        if checkpoint is not None:
+            return sum(len(group) for group in checkpoint["pending"])
+        return sum(len(files) for root, dirs, files in os.walk(folder_path))
+
     def _analyze_dependencies(self, folder_path):
         for root, dirs, files in os.walk(folder_path):
             for file in files:
+                if self._should_stop():
+                    return
                 if file.endswith('.py'):
                     file_path = os.path.join(root, file)
                     self.dependencies[file_path] = self._get_file_dependencies(file_path)
@@ -413,6 +755,8 @@ Explain your reasoning for each suggestion."""
 
     def _build_project_structure(self, folder_path):
         for root, dirs, files in os.walk(folder_path):
+            if self._should_stop():
+                return
             rel_path = os.path.relpath(root, folder_path)
             self.project_structure[rel_path] = {
                 'dirs': dirs,
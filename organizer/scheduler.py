@@ -0,0 +1,95 @@
+import os
+import math
+import time
+
+MAX_SCORED_SIZE = 1 << 30  # Files at or above 1 GB get the full size score
+
+
+def default_score(features, weights):
+    recency = 1 / (1 + features["age_days"] / 7)
+    size = min(1.0, math.log1p(features["size"]) / math.log1p(MAX_SCORED_SIZE))
+    depth = 1 / (1 + features["depth"])
+    rule_miss = 1.0 if features["rule_miss"] else 0.0
+    return (weights.get("recency", 0) * recency +
+            weights.get("size", 0) * size +
+            weights.get("depth", 0) * depth +
+            weights.get("rule_miss", 0) * rule_miss)
+
+
+class WorkScheduler:
+    def __init__(self, config, categorize):
+        self.config = config
+        self.categorize = categorize
+        self._dominant_categories = {}
+
+    def order(self, groups, project_structure):
+        # A content group is settled by one API call, so it scores the sum of its files
+        self._dominant_categories = {}
+        now = time.time()
+        scored = []
+        for index, group in enumerate(groups):
+            score = sum(self.score(file_path, project_structure, now) for file_path in group)
+            scored.append((-score, index, group))
+        scored.sort()
+        return [group for _, _, group in scored]
+
+    def score(self, file_path, project_structure, now=None):
+        features = self.file_features(file_path, project_structure, now or time.time())
+        if features is None:
+            return 0.0
+        score_function = self.config.SCORE_FUNCTION
+        if score_function:
+            return score_function(file_path, features)
+        return default_score(features, self.config.SCHEDULE_WEIGHTS)
+
+    def file_features(self, file_path, project_structure, now):
+        try:
+            stat = os.stat(file_path)
+        except OSError as e:
+            print(f"Error reading file stats for {file_path}: {str(e)}")
+            return None
+        rel_dir = os.path.relpath(os.path.dirname(file_path), self.config.ROOT_PATH)
+        depth = 0 if rel_dir == '.' else rel_dir.count(os.sep) + 1
+        category = self.categorize(file_path)
+        return {
+            "age_days": max(now - stat.st_mtime, 0) / 86400,
+            "size": stat.st_size,
+            "depth": depth,
+            # The extension rules found no category, or the file sits among files of another kind
+            "rule_miss": category == 'other' or category != self._dominant_category(rel_dir, project_structure)
+        }
+
+    def _dominant_category(self, rel_dir, project_structure):
+        if rel_dir not in self._dominant_categories:
+            counts = {}
+            for file in project_structure.get(rel_dir, {}).get('files', []):
+                if self._is_organizer_artifact(file):
+                    continue
+                category = self.categorize(file)
+                counts[category] = counts.get(category, 0) + 1
+            self._dominant_categories[rel_dir] = max(counts, key=counts.get) if counts else None
+        return self._dominant_categories[rel_dir]
+
+    def _is_organizer_artifact(self, file_name):
+        # Tag sidecars, the index and checkpoints are written by the organizer itself
+        checkpoint = self.config.CHECKPOINT_FILE
+        return (file_name.endswith(".tags") or file_name.endswith(".dedup_tmp") or
+                file_name in ("index.txt", checkpoint, checkpoint + ".tmp"))
+
+
+class RunBudget:
+    def __init__(self, seconds=None, api_calls=None, tokens=None):
+        self.seconds = seconds
+        self.api_calls = api_calls
+        self.tokens = tokens
+        self.started_at = time.time()
+
+    def exhausted(self, api_calls_used, tokens_used):
+        # Returns the name of the first budget that has run out, or None
+        if self.seconds is not None and time.time() - self.started_at >= self.seconds:
+            return "time"
+        if self.api_calls is not None and api_calls_used >= self.api_calls:
+            return "api_calls"
+        if self.tokens is not None and tokens_used >= self.tokens:
+            return "tokens"
+        return None